@@ -5,19 +5,24 @@ Uses iterative DFS, early pruning, and intelligent traversal strategies.
 
 import os
 import sys
+import stat
 import argparse
 import time
 import threading
-from pathlib import Path
 from datetime import datetime
-from collections import deque, defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import multiprocessing
 
-from file_classifier import FileClassifier
+from file_classifier import FileClassifier, _suffix_lower
 from media_utils import MediaDurationCalculator
+from scan_utils import SharedDirectoryQueue
 
 
+# Flags for opening a directory descriptor to scan relative to its parent
+_DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+
 class DFSFolderAnalyzer:
     """
     High-performance folder analyzer using optimized DFS algorithms.
@@ -30,9 +35,12 @@ class DFSFolderAnalyzer:
     5. Memory-efficient streaming
     """
     
-    def __init__(self, max_workers=None, max_depth=50, skip_system_dirs=True):
+    # Seconds between progress updates from the parallel scan monitor
+    PROGRESS_INTERVAL = 0.5
+    
+    def __init__(self, max_workers=None, max_depth=50, skip_system_dirs=True, use_cache=True):
         self.classifier = FileClassifier()
-        self.media_calculator = MediaDurationCalculator()
+        self.media_calculator = MediaDurationCalculator(use_cache=use_cache)
         
         # Performance settings
         self.max_workers = max_workers or min(8, (os.cpu_count() or 1))
@@ -53,11 +61,22 @@ class DFSFolderAnalyzer:
             'hidden_system': True  # Skip hidden system files/folders
         }
         
+        # Flattened lookups used by _should_skip_directory on every directory
+        self._skip_names = frozenset(
+            self.skip_patterns['system_dirs'] | self.skip_patterns['large_dirs']
+        )
+        self._hidden_attrs = stat.FILE_ATTRIBUTE_HIDDEN | stat.FILE_ATTRIBUTE_SYSTEM
+        
+        # Classification only depends on the extension: one lookup in the
+        # classifier's inverted extension map
+        self._category_for_ext = self.classifier.get_category_for_extension
+        
         # Statistics
         self.stats = {
             'total_files': 0,
             'total_dirs': 0,
             'skipped_dirs': 0,
+            'total_size': 0,
             'processing_time': 0,
             'classification_time': 0,
             'size_calculation_time': 0
@@ -77,190 +96,328 @@ class DFSFolderAnalyzer:
             with self._lock:
                 self._progress_callback(message, progress)
     
-    def _should_skip_directory(self, dir_path):
+    def _should_skip_directory(self, entry):
         """
         Intelligent directory skipping for performance.
         Uses heuristics to avoid scanning unnecessary directories.
+        
+        Takes the os.DirEntry produced by scandir so the name and (on Windows)
+        the file attributes come from the cached entry, not a fresh stat call.
         """
         if not self.skip_system_dirs:
             return False
             
-        dir_name = Path(dir_path).name
+        dir_name = entry.name
         
-        # Skip system directories
-        if dir_name in self.skip_patterns['system_dirs']:
+        # Skip system and large system directories in one lookup
+        if dir_name in self._skip_names:
             return True
             
-        # Skip large system files/directories
-        if dir_name in self.skip_patterns['large_dirs']:
-            return True
+        if not self.skip_patterns['hidden_system']:
+            return False
             
         # Skip hidden system directories on Windows
-        if self.skip_patterns['hidden_system']:
+        if os.name == 'nt':
             try:
-                if os.name == 'nt':  # Windows
-                    import stat
-                    attrs = os.stat(dir_path).st_file_attributes
-                    if attrs & stat.FILE_ATTRIBUTE_HIDDEN or attrs & stat.FILE_ATTRIBUTE_SYSTEM:
-                        return True
-                elif dir_name.startswith('.') and len(dir_name) > 1:
-                    # Skip hidden directories on Unix-like systems
-                    return True
+                return bool(entry.stat(follow_symlinks=False).st_file_attributes & self._hidden_attrs)
             except (AttributeError, OSError):
-                pass
+                return False
         
-        return False
+        # Skip hidden directories on Unix-like systems
+        return dir_name[:1] == '.' and len(dir_name) > 1
     
-    def dfs_iterative_scan(self, root_path, max_files=500000):
+    def _scan_directory(self, dir_path, classified_files=None, dir_fd=None, extensions=None):
+        """
+        Read a single directory and split its entries into subdirectories and files.
+        
+        File sizes are read from the DirEntry while it is in hand, so the
+        size pass never has to stat the files again. When classified_files is
+        given, each file is also classified by name into it in the same pass,
+        and its extension is added to extensions[category] when that is given.
+        When dir_fd is an open descriptor for dir_path, the directory is read
+        through it and entry paths are built by joining names onto dir_path.
+        
+        Returns:
+            tuple: (subdirs, files, files_size, skipped) where subdirs holds
+            (path, name) pairs and skipped counts the subdirectories pruned by
+            _should_skip_directory. Raises OSError if the directory cannot be read.
+        """
+        subdirs = []
+        files = []
+        files_size = 0
+        skipped = 0
+        # With skipping disabled (--no-skip) avoid a no-op call per directory
+        should_skip = self._should_skip_directory if self.skip_system_dirs else None
+        category_for_ext = self._category_for_ext
+        prefix = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+        
+        with os.scandir(dir_path if dir_fd is None else dir_fd) as entries:
+            for entry in entries:
+                try:
+                    name = entry.name
+                    path = entry.path if dir_fd is None else prefix + name
+                    if entry.is_dir(follow_symlinks=False):
+                        # Skip directories based on heuristics before they
+                        # ever reach the stack
+                        if should_skip is not None and should_skip(entry):
+                            skipped += 1
+                            continue
+                        subdirs.append((path, name))
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append(path)
+                        files_size += entry.stat(follow_symlinks=False).st_size
+                        if classified_files is not None:
+                            ext = _suffix_lower(name)
+                            category = category_for_ext(ext)
+                            classified_files[category].append(path)
+                            if extensions is not None and ext:
+                                extensions[category].add(ext)
+                except (OSError, ValueError):
+                    continue
+        
+        return subdirs, files, files_size, skipped
+    
+    @staticmethod
+    def _release_dir_fd(holder):
+        """Drop one pending child from a [fd, pending] holder, closing the fd at zero."""
+        holder[1] -= 1
+        if holder[1] == 0:
+            os.close(holder[0])
+    
+    def dfs_iterative_scan(self, root_path, max_files=500000, classified_files=None, extensions=None):
         """
         Iterative DFS implementation for folder scanning.
         More memory efficient than recursive DFS, no stack overflow risk.
         
+        Returns the list of file paths; see iter_dfs_scan for the streaming
+        form and the classified_files option.
+        """
+        return list(self.iter_dfs_scan(root_path, max_files, classified_files, extensions))
+    
+    def iter_dfs_scan(self, root_path, max_files=500000, classified_files=None, extensions=None):
+        """
+        Generator form of dfs_iterative_scan that yields file paths as each
+        directory is read, so callers never need the full path list in memory.
+        Scan statistics are recorded once the generator is exhausted.
+        
+        Pass a defaultdict(list) as classified_files to classify files during
+        the scan instead of in a separate pass over the yielded paths, and a
+        defaultdict(set) as extensions to collect each category's extensions
+        for get_category_summary at the same time.
+        
+        On POSIX each subdirectory is opened relative to its parent's
+        descriptor, so the kernel never re-resolves the full path. A parent
+        descriptor stays open only while its children are still on the stack,
+        which in DFS order keeps at most one open descriptor per depth level.
+        
         Algorithm: Iterative DFS with explicit stack
         Time Complexity: O(V + E) where V = directories, E = directory connections
         Space Complexity: O(d) where d = maximum depth
         """
         start_time = time.time()
+        root_path = os.fspath(root_path)
+        use_fds = os.scandir in os.supports_fd and os.open in os.supports_dir_fd
         
-        # Initialize DFS stack with (path, depth) tuples
-        stack = deque([(Path(root_path), 0)])
-        file_paths = []
+        # Initialize DFS stack with (path, name, depth, parent) tuples where
+        # parent is the [fd, pending_children] holder of the parent directory
+        stack = [(root_path, root_path, 0, None)]
+        file_count = 0
+        total_size = 0
         directories_scanned = 0
         
         self._update_progress("Starting DFS folder scan...", 0)
         
-        while stack and len(file_paths) < max_files:
-            current_path, depth = stack.pop()
-            
-            # Depth limit check
-            if depth > self.max_depth:
-                continue
-                
-            try:
-                # Skip directories based on heuristics
-                if self._should_skip_directory(current_path):
-                    self.stats['skipped_dirs'] += 1
-                    continue
-                
-                # Scan current directory
-                directories_scanned += 1
-                dir_items = []
+        try:
+            while stack and file_count < max_files:
+                current_path, name, depth, parent = stack.pop()
+                dir_fd = None
+                files = ()
                 
                 try:
-                    dir_items = list(os.scandir(current_path))
-                except (PermissionError, OSError):
-                    continue
-                
-                # Separate files and directories for optimal processing
-                subdirs = []
-                files = []
-                
-                for entry in dir_items:
+                    # Depth limit check
+                    if depth > self.max_depth:
+                        continue
+                    
+                    # Scan current directory
+                    directories_scanned += 1
+                    
                     try:
-                        if entry.is_dir(follow_symlinks=False):
-                            subdirs.append(entry.path)
-                        elif entry.is_file(follow_symlinks=False):
-                            files.append(entry.path)
-                    except (OSError, ValueError):
+                        if use_fds:
+                            dir_fd = os.open(
+                                name, _DIR_OPEN_FLAGS,
+                                dir_fd=parent[0] if parent is not None else None
+                            )
+                        subdirs, files, files_size, skipped = self._scan_directory(
+                            current_path, classified_files, dir_fd, extensions
+                        )
+                    except (PermissionError, OSError):
                         continue
+                    
+                    self.stats['skipped_dirs'] += skipped
+                    
+                    file_count += len(files)
+                    total_size += files_size
+                    
+                    # Children keep this directory's descriptor open until the
+                    # last of them has been opened
+                    holder = None
+                    if subdirs and dir_fd is not None:
+                        holder = [dir_fd, len(subdirs)]
+                        dir_fd = None
+                    
+                    # Add subdirectories to stack. Traversal order does not
+                    # matter since results are aggregated per category
+                    stack.extend([
+                        (subdir, subdir_name, depth + 1, holder)
+                        for subdir, subdir_name in subdirs
+                    ])
+                    
+                    # Progress update
+                    if directories_scanned % 100 == 0:
+                        progress = min(90, (file_count / max_files) * 90)
+                        self._update_progress(
+                            f"DFS Scanning: {file_count} files, {directories_scanned} dirs", 
+                            progress
+                        )
+                    
+                except Exception as e:
+                    continue
+                finally:
+                    if dir_fd is not None:
+                        os.close(dir_fd)
+                    if parent is not None:
+                        self._release_dir_fd(parent)
                 
-                # Add files to results
-                file_paths.extend(files)
-                
-                # Add subdirectories to stack (reverse order for proper DFS)
-                # Sort directories for consistent traversal order
-                subdirs.sort(reverse=True)
-                for subdir in subdirs:
-                    stack.append((Path(subdir), depth + 1))
-                
-                # Progress update
-                if directories_scanned % 100 == 0:
-                    progress = min(90, (len(file_paths) / max_files) * 90)
-                    self._update_progress(
-                        f"DFS Scanning: {len(file_paths)} files, {directories_scanned} dirs", 
-                        progress
-                    )
-                
-            except Exception as e:
-                continue
-        
-        self.stats['total_files'] = len(file_paths)
+                # Hand this directory's files to the consumer
+                yield from files
+        finally:
+            # Close descriptors still held for directories left on the stack
+            # when the scan stops early
+            for _, _, _, parent in stack:
+                if parent is not None and parent[1] > 0:
+                    os.close(parent[0])
+                    parent[1] = 0
+        
+        self.stats['total_files'] = file_count
         self.stats['total_dirs'] = directories_scanned
+        self.stats['total_size'] = total_size
         self.stats['processing_time'] = time.time() - start_time
         
-        self._update_progress(f"DFS scan completed: {len(file_paths)} files found", 95)
-        return file_paths
+        self._update_progress(f"DFS scan completed: {file_count} files found", 95)
     
-    def parallel_dfs_scan(self, root_path, max_files=500000):
+    def parallel_dfs_scan(self, root_path, max_files=500000, classified_files=None, extensions=None):
         """
         Parallel DFS implementation using multiple worker threads.
-        Each worker handles a different subtree for maximum parallelization.
         
-        Algorithm: Divide-and-conquer DFS with work stealing
+        Workers share one SharedDirectoryQueue instead of being handed a
+        fixed top-level subtree each, so a single huge subtree (node_modules,
+        a media library) is spread across every worker rather than pinning one.
+        
+        Like dfs_iterative_scan, files are classified into classified_files
+        (and their extensions collected into extensions) during the scan when
+        it is given.
+        
+        Each worker keeps its own file list and counters and they are only
+        reduced into self.stats after the join; progress is reported by a
+        single monitor thread every PROGRESS_INTERVAL seconds rather than by
+        the workers themselves.
+        
+        Algorithm: Shared-deque DFS with work stealing
         """
         start_time = time.time()
         
-        # First, get immediate subdirectories for parallel processing
-        try:
-            root_subdirs = [
-                d.path for d in os.scandir(root_path) 
-                if d.is_dir(follow_symlinks=False) and not self._should_skip_directory(d.path)
-            ]
-        except (PermissionError, OSError):
-            # Fallback to single-threaded DFS
-            return self.dfs_iterative_scan(root_path, max_files)
-        
-        if len(root_subdirs) < 2:
-            # Not enough subdirectories for parallelization
-            return self.dfs_iterative_scan(root_path, max_files)
+        if self.max_workers < 2:
+            return self.dfs_iterative_scan(root_path, max_files, classified_files, extensions)
         
-        self._update_progress(f"Starting parallel DFS on {len(root_subdirs)} subtrees...", 0)
+        # Shared work queue of (path, depth) tuples
+        work = SharedDirectoryQueue([(os.fspath(root_path), 0)])
+        lock = threading.Lock()
+        state = {'files': 0}
+        worker_results = []
+        scan_done = threading.Event()
         
-        all_files = []
-        files_per_worker = max_files // len(root_subdirs)
+        self._update_progress(f"Starting parallel DFS with {self.max_workers} workers...", 0)
         
-        # Launch parallel DFS workers
-        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(root_subdirs))) as executor:
-            future_to_subdir = {
-                executor.submit(self.dfs_iterative_scan, subdir, files_per_worker): subdir 
-                for subdir in root_subdirs
-            }
+        def worker():
+            local_files = []
+            local_classified = defaultdict(list) if classified_files is not None else None
+            local_extensions = defaultdict(set) if extensions is not None else None
+            local = {'size': 0, 'dirs': 0, 'skipped': 0}
             
-            completed = 0
-            for future in as_completed(future_to_subdir):
-                subdir = future_to_subdir[future]
-                try:
-                    subdir_files = future.result()
-                    all_files.extend(subdir_files)
-                    completed += 1
-                    
-                    progress = (completed / len(root_subdirs)) * 90
-                    self._update_progress(
-                        f"Parallel DFS: {completed}/{len(root_subdirs)} subtrees completed", 
-                        progress
+            def process(item):
+                current_path, depth = item
+                subdirs = []
+                files = []
+                if depth <= self.max_depth:
+                    try:
+                        subdirs, files, files_size, skipped = self._scan_directory(
+                            current_path, local_classified, extensions=local_extensions
+                        )
+                        local['size'] += files_size
+                        local['dirs'] += 1
+                        local['skipped'] += skipped
+                    except (PermissionError, OSError):
+                        pass
+                    except Exception as e:
+                        print(f"Error scanning directory {current_path}: {e}")
+                
+                local_files.extend(files)
+                
+                with lock:
+                    state['files'] += len(files)
+                    if state['files'] >= max_files:
+                        work.stop()
+                return [(subdir, depth + 1) for subdir, _ in subdirs]
+            
+            try:
+                work.run(process)
+            finally:
+                with lock:
+                    worker_results.append(
+                        (local_files, local_classified, local_extensions,
+                         local['size'], local['dirs'], local['skipped'])
                     )
-                    
-                    # Early termination if we have enough files
-                    if len(all_files) >= max_files:
-                        break
-                        
-                except Exception as e:
-                    print(f"Error processing subtree {subdir}: {e}")
-        
-        # Also scan files in root directory
-        try:
-            root_files = [
-                f.path for f in os.scandir(root_path) 
-                if f.is_file(follow_symlinks=False)
-            ]
-            all_files.extend(root_files)
-        except (PermissionError, OSError):
-            pass
-        
-        # Limit results
-        if len(all_files) > max_files:
-            all_files = all_files[:max_files]
         
+        def monitor():
+            # state['files'] is only read here, so no lock is needed for a
+            # progress snapshot
+            while not scan_done.wait(self.PROGRESS_INTERVAL):
+                found = state['files']
+                progress = min(90, (found / max_files) * 90)
+                self._update_progress(f"Parallel DFS: {found} files found", progress)
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.max_workers)]
+        monitor_thread = threading.Thread(target=monitor, daemon=True)
+        monitor_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scan_done.set()
+        monitor_thread.join()
+        if work.error is not None:
+            raise work.error
+        
+        # Workers stop at directory granularity once max_files is reached,
+        # matching dfs_iterative_scan, so the summed sizes cover every path
+        all_files = []
+        total_size = 0
+        total_dirs = 0
+        for files, classified, worker_extensions, files_size, dirs, skipped in worker_results:
+            all_files.extend(files)
+            if classified_files is not None:
+                for category, category_files in classified.items():
+                    classified_files[category].extend(category_files)
+            if extensions is not None:
+                for category, category_extensions in worker_extensions.items():
+                    extensions[category] |= category_extensions
+            total_size += files_size
+            total_dirs += dirs
+            self.stats['skipped_dirs'] += skipped
+        
+        self.stats['total_files'] = len(all_files)
+        self.stats['total_dirs'] = total_dirs
+        self.stats['total_size'] = total_size
         self.stats['processing_time'] = time.time() - start_time
         self._update_progress(f"Parallel DFS completed: {len(all_files)} files found", 95)
         
@@ -271,94 +428,76 @@ class DFSFolderAnalyzer:
         Stream-based file classification with lazy evaluation.
         Processes files as they're found rather than loading all into memory.
         
+        file_paths may be any iterable, e.g. iter_dfs_scan(), in which case
+        only one batch of paths is held at a time.
+        
         Algorithm: Streaming classification with batched processing
         Memory Complexity: O(batch_size) instead of O(n)
         """
         start_time = time.time()
         classified_files = defaultdict(list)
         batch_size = 1000
-        batch = []
         
         self._update_progress("Starting streaming classification...", 0)
         
-        total_files = len(file_paths)
+        total_files = len(file_paths) if hasattr(file_paths, '__len__') else None
         processed = 0
+        paths = iter(file_paths)
         
-        for file_path in file_paths:
-            batch.append(file_path)
+        while True:
+            batch = list(islice(paths, batch_size))
+            if not batch:
+                break
             
-            if len(batch) >= batch_size:
-                # Process batch
-                self._process_classification_batch(batch, classified_files)
-                processed += len(batch)
-                batch = []
-                
-                # Update progress
+            self._process_classification_batch(batch, classified_files)
+            processed += len(batch)
+            
+            # Update progress
+            if total_files:
                 progress = (processed / total_files) * 100
                 self._update_progress(f"Classifying: {processed}/{total_files} files", progress)
-        
-        # Process remaining files
-        if batch:
-            self._process_classification_batch(batch, classified_files)
+            else:
+                self._update_progress(f"Classifying: {processed} files")
         
         self.stats['classification_time'] = time.time() - start_time
         return dict(classified_files)
     
     def _process_classification_batch(self, file_paths, classified_files):
-        """Process a batch of files for classification."""
+        """
+        Process a batch of files for classification.
+        
+        Paths come from the DFS scan, which only collects regular files, so
+        they are classified by extension without re-checking the filesystem.
+        """
+        category_for_ext = self._category_for_ext
         for file_path in file_paths:
-            if os.path.isfile(file_path):
-                category = self.classifier.get_category(file_path)
-                classified_files[category].append(file_path)
+            category = category_for_ext(_suffix_lower(file_path))
+            classified_files[category].append(file_path)
     
     def optimized_size_calculation(self, file_paths):
         """
-        Optimized concurrent size calculation with batching.
-        Uses memory mapping for large files when possible.
+        Sequential size calculation for a list of paths.
+        
+        Each file costs a single stat syscall, so a thread pool only added
+        future/GIL overhead without overlapping any real work.
         
-        Algorithm: Concurrent batch processing with memory optimization
+        Algorithm: Single pass with one stat per file
         """
         start_time = time.time()
         total_size = 0
-        batch_size = 2000
         total_files = len(file_paths)
-        processed = 0
         
         self._update_progress("Starting optimized size calculation...", 0)
         
-        def calculate_batch_sizes(file_batch):
-            """Calculate sizes for a batch of files."""
-            batch_total = 0
-            for file_path in file_batch:
-                try:
-                    # Use os.path.getsize for better performance than os.stat
-                    if os.path.exists(file_path):
-                        batch_total += os.path.getsize(file_path)
-                except (OSError, ValueError):
-                    continue
-            return batch_total
-        
-        # Process in parallel batches
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Create batches
-            batches = [
-                file_paths[i:i + batch_size] 
-                for i in range(0, len(file_paths), batch_size)
-            ]
-            
-            # Submit all batches
-            future_to_batch = {
-                executor.submit(calculate_batch_sizes, batch): batch 
-                for batch in batches
-            }
+        for processed, file_path in enumerate(file_paths, 1):
+            try:
+                # A missing file raises OSError, so no separate exists() stat
+                total_size += os.path.getsize(file_path)
+            except (OSError, ValueError):
+                pass
             
-            # Collect results
-            for future in as_completed(future_to_batch):
-                batch_size_result = future.result()
-                total_size += batch_size_result
-                processed += len(future_to_batch[future])
-                
-                # Update progress
+            # Update progress
+            if processed % 2000 == 0:
                 progress = (processed / total_files) * 100
                 self._update_progress(f"Calculating sizes: {processed}/{total_files}", progress)
         
@@ -372,33 +511,35 @@ class DFSFolderAnalyzer:
         Performance Features:
         1. Iterative or Parallel DFS traversal
         2. Intelligent directory skipping
-        3. Streaming classification
-        4. Concurrent size calculation
-        5. Early termination conditions
+        3. Single fused pass: classification and file sizes are taken from
+           the scandir entries while the directory is being read
+        4. Early termination conditions
         """
         analysis_start = time.time()
         
         self._update_progress("Initializing DFS analysis...", 0)
         
-        # Choose scanning algorithm based on complexity
+        # Choose scanning algorithm based on complexity; the scan classifies
+        # files and sums their sizes as it goes
+        classified_files = defaultdict(list)
+        extensions = defaultdict(set)
         if use_parallel:
-            file_paths = self.parallel_dfs_scan(folder_path, max_files)
+            self.parallel_dfs_scan(folder_path, max_files, classified_files, extensions)
         else:
-            file_paths = self.dfs_iterative_scan(folder_path, max_files)
+            # The fused scan fills classified_files, so just drain the
+            # generator rather than materializing a second list of paths
+            for _ in self.iter_dfs_scan(folder_path, max_files, classified_files, extensions):
+                pass
         
-        if not file_paths:
+        file_count = self.stats['total_files']
+        if not file_count:
             return self._create_empty_results(folder_path, "No accessible files found")
         
-        # Streaming classification
-        self._update_progress("Classifying files with streaming algorithm...", 15)
-        classified_files = self.streaming_classification(file_paths)
+        classified_files = dict(classified_files)
+        total_size = self.stats['total_size']
         
         # Generate summary
-        summary = self.classifier.get_category_summary(classified_files)
-        
-        # Optimized size calculation
-        self._update_progress("Calculating sizes with concurrent algorithm...", 30)
-        total_size = self.optimized_size_calculation(file_paths)
+        summary = self.classifier.get_category_summary(classified_files, extensions)
         
         # Media duration calculation (if requested)
         media_durations = {}
@@ -415,15 +556,18 @@ class DFSFolderAnalyzer:
                 
                 if media_files:
                     self._update_progress("Calculating media durations...", 60)
-                    media_durations = self._calculate_media_durations_optimized(media_files)
+                    try:
+                        media_durations = self._calculate_media_durations_optimized(media_files)
+                    finally:
+                        self.media_calculator.close()
         
         # Prepare final results
         total_time = time.time() - analysis_start
         
         results = {
-            'folder_path': str(Path(folder_path).resolve()),
+            'folder_path': os.path.abspath(folder_path),
             'scan_time': datetime.now().isoformat(),
-            'total_files': len(file_paths),
+            'total_files': file_count,
             'classified_files': classified_files,
             'file_summary': summary,
             'media_durations': media_durations,
@@ -434,8 +578,6 @@ class DFSFolderAnalyzer:
             'performance_stats': {
                 'total_analysis_time': total_time,
                 'dfs_scan_time': self.stats.get('processing_time', 0),
-                'classification_time': self.stats.get('classification_time', 0),
-                'size_calculation_time': self.stats.get('size_calculation_time', 0),
                 'directories_scanned': self.stats.get('total_dirs', 0),
                 'directories_skipped': self.stats.get('skipped_dirs', 0),
                 'parallel_processing': use_parallel,
@@ -462,15 +604,16 @@ class DFSFolderAnalyzer:
                 sample_size = max(100, len(files) // 10)
                 sampled_files = random.sample(files, sample_size)
                 
-                # Calculate average duration from sample
+                # Calculate average duration from sample. Each probe is an
+                # ffprobe subprocess, so run them concurrently across workers
                 total_sample_duration = 0
                 valid_samples = 0
                 
-                for file_path in sampled_files:
-                    duration = self.media_calculator.get_duration(file_path)
-                    if duration > 0:
-                        total_sample_duration += duration
-                        valid_samples += 1
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    for duration in executor.map(self.media_calculator.get_duration, sampled_files):
+                        if duration > 0:
+                            total_sample_duration += duration
+                            valid_samples += 1
                 
                 if valid_samples > 0:
                     avg_duration = total_sample_duration / valid_samples
@@ -510,14 +653,15 @@ class DFSFolderAnalyzer:
         if size_bytes == 0:
             return "0 B"
             
-        size_names = ["B", "KB", "MB", "GB", "TB", "PB"]
-        i = 0
+        size_names = ("B", "KB", "MB", "GB", "TB", "PB")
         
-        while size_bytes >= 1024 and i < len(size_names) - 1:
-            size_bytes /= 1024.0
-            i += 1
+        # Unit index straight from the bit length (each unit is 2**10 larger);
+        # anything under 1 KB, fractions and negatives included, stays in bytes
+        i = 0
+        if size_bytes >= 1024:
+            i = min((int(size_bytes).bit_length() - 1) // 10, len(size_names) - 1)
             
-        return f"{size_bytes:.1f} {size_names[i]}"
+        return f"{size_bytes / (1 << (10 * i)):.1f} {size_names[i]}"
     
     def get_algorithm_info(self):
         """Get detailed information about algorithms used."""
@@ -527,9 +671,8 @@ class DFSFolderAnalyzer:
             'space_complexity': 'O(d) where d=maximum depth',
             'optimizations': [
                 'Intelligent directory pruning',
-                'Parallel subtree processing',
-                'Streaming classification',
-                'Concurrent size calculation',
+                'Work-stealing parallel traversal',
+                'Classification and sizing fused into the scan',
                 'Memory-efficient batching',
                 'Early termination conditions',
                 'Statistical sampling for large media collections'
@@ -559,6 +702,7 @@ def main():
     parser.add_argument('--workers', type=int, help='Number of worker threads')
     parser.add_argument('--no-parallel', action='store_true', help='Disable parallel DFS')
     parser.add_argument('--no-skip', action='store_true', help='Disable system directory skipping')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the media duration cache')
     parser.add_argument('--algorithm-info', action='store_true', help='Show algorithm information')
     
     args = parser.parse_args()
@@ -567,7 +711,8 @@ def main():
     analyzer = DFSFolderAnalyzer(
         max_workers=args.workers,
         max_depth=args.max_depth,
-        skip_system_dirs=not args.no_skip
+        skip_system_dirs=not args.no_skip,
+        use_cache=not args.no_cache
     )
     
     # Set up progress callback
@@ -615,8 +760,6 @@ def main():
             print(f"{'-'*40}")
             print(f"Total Analysis Time: {stats['total_analysis_time']:.2f}s")
             print(f"DFS Scan Time: {stats['dfs_scan_time']:.2f}s")
-            print(f"Classification Time: {stats['classification_time']:.2f}s")
-            print(f"Size Calculation Time: {stats['size_calculation_time']:.2f}s")
             print(f"Directories Scanned: {stats['directories_scanned']:,}")
             print(f"Directories Skipped: {stats['directories_skipped']:,}")
             print(f"Parallel Processing: {'Yes' if stats['parallel_processing'] else 'No'}")
@@ -4,65 +4,104 @@ File classifier module for categorizing files by extension type.
 
 import os
 from collections import defaultdict
-from pathlib import Path
+
+
+def _suffix_lower(file_path):
+    """
+    Get the lower-cased extension of a path without building a Path object.
+    
+    Follows Path.suffix: dotfiles like '.bashrc' and names ending in '.'
+    have no extension.
+    """
+    file_path = os.fspath(file_path)
+    sep = max(file_path.rfind('/'), file_path.rfind('\\'))
+    dot = file_path.rfind('.')
+    if dot <= sep + 1 or dot == len(file_path) - 1:
+        return ''
+    return file_path[dot:].lower()
 
 
 class FileClassifier:
     """Classifies files by their extension types."""
     
+    # File extension categories, shared by all instances
+    CATEGORIES = {
+        'video': frozenset({
+            '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', 
+            '.m4v', '.3gp', '.mpg', '.mpeg', '.m2v', '.mxf'
+        }),
+        'audio': frozenset({
+            '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a',
+            '.aiff', '.au', '.ra', '.3ga', '.amr', '.awb'
+        }),
+        'documents': frozenset({
+            '.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.pages',
+            '.xls', '.xlsx', '.ppt', '.pptx', '.odp', '.ods'
+        }),
+        'images': frozenset({
+            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif',
+            '.svg', '.webp', '.ico', '.psd', '.raw', '.cr2', '.nef'
+        }),
+        'archives': frozenset({
+            '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz', '.Z'
+        }),
+        'code': frozenset({
+            '.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.h',
+            '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.ts', '.jsx',
+            '.tsx', '.vue', '.sql', '.xml', '.json', '.yaml', '.yml'
+        })
+    }
+    
+    # Inverted extension -> category map so lookups are a single dict hit.
+    # Keys are lower-cased to match _suffix_lower (e.g. '.Z' -> '.z')
+    _EXT_TO_CATEGORY = {
+        ext.lower(): category
+        for category, extensions in CATEGORIES.items()
+        for ext in extensions
+    }
+    
     def __init__(self):
-        # Define file extension categories
-        self.categories = {
-            'video': {
-                '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', 
-                '.m4v', '.3gp', '.mpg', '.mpeg', '.m2v', '.mxf'
-            },
-            'audio': {
-                '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a',
-                '.aiff', '.au', '.ra', '.3ga', '.amr', '.awb'
-            },
-            'documents': {
-                '.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.pages',
-                '.xls', '.xlsx', '.ppt', '.pptx', '.odp', '.ods'
-            },
-            'images': {
-                '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif',
-                '.svg', '.webp', '.ico', '.psd', '.raw', '.cr2', '.nef'
-            },
-            'archives': {
-                '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz', '.Z'
-            },
-            'code': {
-                '.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.h',
-                '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.ts', '.jsx',
-                '.tsx', '.vue', '.sql', '.xml', '.json', '.yaml', '.yml'
-            }
-        }
+        # Instance references kept for existing callers
+        self.categories = self.CATEGORIES
+        self._ext_to_category = self._EXT_TO_CATEGORY
         
     def get_category(self, file_path):
         """
         Get the category of a file based on its extension.
         
+        The lookup is keyed on the extension alone: one dict hit in the
+        inverted extension map, so no per-path memoization is needed.
+        
         Args:
             file_path (str): Path to the file
             
         Returns:
             str: Category name ('video', 'audio', 'documents', etc.) or 'others'
         """
-        extension = Path(file_path).suffix.lower()
+        return self.get_category_for_extension(_suffix_lower(file_path))
+    
+    def get_category_for_extension(self, ext):
+        """
+        Get the category for an already extracted extension.
         
-        for category, extensions in self.categories.items():
-            if extension in extensions:
-                return category
-                
-        return 'others'
+        Args:
+            ext (str): Lower-cased extension including the dot (e.g. '.mp4')
+            
+        Returns:
+            str: Category name or 'others'
+        """
+        return self._ext_to_category.get(ext, 'others')
     
-    def classify_files(self, file_paths):
+    def classify_files(self, file_paths, prechecked=False, extensions=None):
         """
         Classify a list of file paths into categories.
         
         Args:
             file_paths (list): List of file paths
+            prechecked (bool): Paths are already known to be regular files
+                (e.g. from a scandir walk), so skip the os.path.isfile check
+            extensions (dict): Optional dict filled with the set of extensions
+                seen per category, for get_category_summary()
             
         Returns:
             dict: Dictionary with categories as keys and lists of files as values
@@ -70,9 +109,12 @@ class FileClassifier:
         classified = defaultdict(list)
         
         for file_path in file_paths:
-            if os.path.isfile(file_path):
-                category = self.get_category(file_path)
+            if prechecked or os.path.isfile(file_path):
+                ext = _suffix_lower(file_path)
+                category = self.get_category_for_extension(ext)
                 classified[category].append(file_path)
+                if extensions is not None and ext:
+                    extensions.setdefault(category, set()).add(ext)
                 
         return dict(classified)
     
@@ -84,16 +126,18 @@ class FileClassifier:
             category (str): Category name
             
         Returns:
-            set: Set of extensions for the category
+            frozenset: Set of extensions for the category
         """
-        return self.categories.get(category, set())
+        return self.categories.get(category, frozenset())
     
-    def get_category_summary(self, classified_files):
+    def get_category_summary(self, classified_files, extensions=None):
         """
         Generate a summary of classified files.
         
         Args:
             classified_files (dict): Dictionary from classify_files()
+            extensions (dict): Extension sets per category collected while
+                classifying; when omitted they are recomputed from the paths
             
         Returns:
             dict: Summary with counts and unique extensions per category
@@ -101,15 +145,15 @@ class FileClassifier:
         summary = {}
         
         for category, files in classified_files.items():
-            extensions = set()
-            for file_path in files:
-                ext = Path(file_path).suffix.lower()
-                if ext:
-                    extensions.add(ext)
+            if extensions is not None:
+                category_extensions = extensions.get(category, ())
+            else:
+                # Suffix computed once per file; '' (no extension) is dropped
+                category_extensions = {ext for ext in map(_suffix_lower, files) if ext}
             
             summary[category] = {
                 'count': len(files),
-                'extensions': sorted(list(extensions)),
+                'extensions': sorted(category_extensions),
                 'files': files
             }
             
@@ -4,62 +4,89 @@ Main folder analyzer application for scanning folders and calculating media dura
 
 import os
 import sys
+import logging
 import argparse
-from pathlib import Path
 from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from file_classifier import FileClassifier
 from media_utils import MediaDurationCalculator
+from scan_utils import walk_files
+
+
+logger = logging.getLogger(__name__)
 
 
 class FolderAnalyzer:
     """Main class for analyzing folder contents and media durations."""
     
-    def __init__(self):
+    # Log duration progress once per this many probed files
+    DURATION_PROGRESS_INTERVAL = 100
+    
+    def __init__(self, use_cache=True):
         self.classifier = FileClassifier()
-        self.media_calculator = MediaDurationCalculator()
+        # use_cache=False also bypasses the on-disk ffprobe duration cache
+        self.media_calculator = MediaDurationCalculator(use_cache=use_cache)
         
-    def scan_folder(self, folder_path):
+    def iter_files(self, folder_path):
         """
-        Recursively scan a folder and return all file paths.
+        Recursively walk a folder, yielding one tuple per file.
+        
+        Uses an explicit os.scandir stack so file/directory checks and sizes
+        come from the directory entries instead of extra calls per path.
         
         Args:
             folder_path (str): Path to the folder to scan
             
-        Returns:
-            list: List of all file paths found
+        Yields:
+            tuple: (path, size in bytes, lower-cased extension)
         """
-        file_paths = []
-        
         try:
-            folder_path = Path(folder_path).resolve()
+            # abspath is purely lexical; unlike Path.resolve() it does not stat
+            # every path component
+            folder_path = os.path.abspath(os.fspath(folder_path))
             
-            if not folder_path.exists():
-                print(f"Error: Folder '{folder_path}' does not exist.")
-                return []
-                
-            if not folder_path.is_dir():
-                print(f"Error: '{folder_path}' is not a directory.")
-                return []
+            if not os.path.isdir(folder_path):
+                if not os.path.exists(folder_path):
+                    logger.error("Error: Folder '%s' does not exist.", folder_path)
+                else:
+                    logger.error("Error: '%s' is not a directory.", folder_path)
+                return
                 
-            print(f"Scanning folder: {folder_path}")
+            logger.info("Scanning folder: %s", folder_path)
             
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    file_path = Path(root) / file
-                    file_paths.append(str(file_path))
+            yield from walk_files(folder_path)
                     
         except PermissionError as e:
-            print(f"Permission error: {e}")
+            logger.error("Permission error: %s", e)
         except Exception as e:
-            print(f"Error scanning folder: {e}")
+            logger.error("Error scanning folder: %s", e)
+    
+    def scan_folder(self, folder_path):
+        """
+        Recursively scan a folder and return all file paths.
+        
+        Args:
+            folder_path (str): Path to the folder to scan
             
-        return file_paths
+        Returns:
+            list: List of all file paths found
+        """
+        return [file_path for file_path, _, _ in self.iter_files(folder_path)]
     
     def analyze_folder(self, folder_path, calculate_durations=True):
         """
         Analyze a folder's contents and generate a comprehensive report.
         
+        The folder is walked once; sizes, categories and the ffprobe queue
+        are all filled in from that single stream of files.
+        
         Args:
             folder_path (str): Path to the folder to analyze
             calculate_durations (bool): Whether to calculate media durations
@@ -67,69 +94,84 @@ class FolderAnalyzer:
         Returns:
             dict: Analysis results
         """
-        print(f"\n{'='*60}")
-        print(f"FOLDER ANALYSIS STARTED")
-        print(f"{'='*60}")
+        logger.info("\n%s\nFOLDER ANALYSIS STARTED\n%s", '='*60, '='*60)
         
-        # Scan folder for files
-        file_paths = self.scan_folder(folder_path)
+        # Absolute path computed once, shared by the scan and the results
+        folder_path = os.path.abspath(os.fspath(folder_path))
         
-        if not file_paths:
-            return {
-                'folder_path': folder_path,
-                'total_files': 0,
-                'classified_files': {},
-                'media_durations': {},
-                'total_size': 0,
-                'error': 'No files found or unable to access folder'
-            }
-        
-        print(f"Found {len(file_paths)} files")
-        
-        # Classify files by extension
-        print("Classifying files by type...")
-        classified_files = self.classifier.classify_files(file_paths)
-        summary = self.classifier.get_category_summary(classified_files)
-        
-        # Calculate total size
-        total_size = 0
-        for file_path in file_paths:
-            try:
-                total_size += os.path.getsize(file_path)
-            except OSError:
-                pass
-        
-        # Calculate media durations if requested
-        media_durations = {}
+        # Check FFmpeg availability up front so probes can start during the scan
         if calculate_durations:
-            print("Calculating media durations...")
-            
-            # Check FFmpeg availability
             ffmpeg_status = self.media_calculator.check_ffmpeg_availability()
             if not ffmpeg_status['available']:
-                print(f"Warning: {ffmpeg_status['error']}")
-                print("Media durations will not be calculated.")
+                logger.warning("Warning: %s", ffmpeg_status['error'])
+                logger.warning("Media durations will not be calculated.")
                 calculate_durations = False
+        
+        # Scan, size and classify in one pass, queueing media files for ffprobe
+        # as they are found
+        classified_files = defaultdict(list)
+        extensions = defaultdict(set)
+        duration_queues = {media_type: [] for media_type in MediaDurationCalculator.MEDIA_CATEGORIES}
+        total_files = 0
+        total_size = 0
+        executor = ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4) if calculate_durations else None
+        
+        try:
+            category_for_extension = self.classifier.get_category_for_extension
+            for file_path, size, ext in self.iter_files(folder_path):
+                total_files += 1
+                total_size += size
+                category = category_for_extension(ext)
+                classified_files[category].append(file_path)
+                if ext:
+                    extensions[category].add(ext)
+                if executor is not None and category in duration_queues:
+                    duration_queues[category].append(
+                        (file_path, executor.submit(self.media_calculator.get_duration, file_path))
+                    )
             
-            if calculate_durations:
-                # Calculate video durations
-                video_files = classified_files.get('video', [])
-                if video_files:
-                    print(f"Calculating durations for {len(video_files)} video files...")
-                    video_duration_data = self.media_calculator.calculate_total_duration(video_files)
-                    media_durations['video'] = video_duration_data
-                
-                # Calculate audio durations
-                audio_files = classified_files.get('audio', [])
-                if audio_files:
-                    print(f"Calculating durations for {len(audio_files)} audio files...")
-                    audio_duration_data = self.media_calculator.calculate_total_duration(audio_files)
-                    media_durations['audio'] = audio_duration_data
+            if not total_files:
+                return {
+                    'folder_path': folder_path,
+                    'total_files': 0,
+                    'classified_files': {},
+                    'media_durations': {},
+                    'total_size': 0,
+                    'error': 'No files found or unable to access folder'
+                }
+            
+            logger.info("Found %d files", total_files)
+            
+            classified_files = dict(classified_files)
+            summary = self.classifier.get_category_summary(classified_files, extensions)
+            
+            # Collect media durations if requested
+            media_durations = {}
+            if executor is not None:
+                logger.info("Calculating media durations...")
+                for media_type, queued in duration_queues.items():
+                    if not queued:
+                        continue
+                    logger.info("Calculating durations for %d %s files...", len(queued), media_type)
+                    durations = {}
+                    for done, (file_path, future) in enumerate(queued, 1):
+                        durations[file_path] = future.result()
+                        if done % self.DURATION_PROGRESS_INTERVAL == 0:
+                            logger.info("  %d/%d %s files probed", done, len(queued), media_type)
+                    media_durations[media_type] = {
+                        'individual_durations': durations,
+                        'total_duration': sum(durations.values()),
+                        'total_files': len(queued)
+                    }
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+            self.media_calculator.close()
         
         return {
-            'folder_path': str(Path(folder_path).resolve()),
+            'folder_path': folder_path,
             'scan_time': datetime.now().isoformat(),
-            'total_files': len(file_paths),
+            'total_files': total_files,
             'classified_files': classified_files,
             'file_summary': summary,
             'media_durations': media_durations,
@@ -150,14 +192,16 @@ class FolderAnalyzer:
         if size_bytes == 0:
             return "0 B"
             
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        i = 0
+        size_names = ("B", "KB", "MB", "GB", "TB")
         
-        while size_bytes >= 1024 and i < len(size_names) - 1:
-            size_bytes /= 1024.0
-            i += 1
+        # Each unit is 2**10 times the previous one, so the bit length of the
+        # size picks the unit directly; anything under 1 KB (fractions and
+        # negative sizes included) stays in bytes
+        i = 0
+        if size_bytes >= 1024:
+            i = min((int(size_bytes).bit_length() - 1) // 10, len(size_names) - 1)
             
-        return f"{size_bytes:.1f} {size_names[i]}"
+        return f"{size_bytes / (1 << (10 * i)):.1f} {size_names[i]}"
     
     def print_report(self, analysis_results):
         """
@@ -175,6 +219,8 @@ class FolderAnalyzer:
         print(f"Scan Time: {results.get('scan_time', 'Unknown')}")
         print(f"Total Files: {results['total_files']}")
         print(f"Total Size: {self.format_size(results['total_size'])}")
+        if results.get('truncated'):
+            print("Note: File limit reached; results cover only the files scanned")
         
         if 'error' in results:
             print(f"\nError: {results['error']}")
@@ -218,18 +264,28 @@ class FolderAnalyzer:
         """
         Save analysis results to a file.
         
+        Uses orjson when it is installed, which is much faster than the json
+        module for reports listing many thousands of files.
+        
         Args:
             analysis_results (dict): Results from analyze_folder()
             output_file (str): Path to output file
         """
         try:
-            import json
-            
             # Create a JSON-serializable version of the results
             json_results = analysis_results.copy()
             
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(json_results, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                with open(output_file, 'wb') as f:
+                    f.write(orjson.dumps(
+                        json_results,
+                        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                    ))
+            else:
+                import json
+                
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump(json_results, f, indent=2, ensure_ascii=False)
                 
             print(f"\nAnalysis results saved to: {output_file}")
             
@@ -267,10 +323,19 @@ Examples:
         help='Skip media duration calculation'
     )
     
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the media duration cache'
+    )
+    
     args = parser.parse_args()
     
+    # Progress messages go through logging; show them on the console
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     # Create analyzer instance
-    analyzer = FolderAnalyzer()
+    analyzer = FolderAnalyzer(use_cache=not args.no_cache)
     
     # Analyze the folder
     try:
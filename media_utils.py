@@ -3,17 +3,129 @@ Media utilities module for calculating media file durations using FFmpeg.
 """
 
 import os
+import stat
+import shutil
+import logging
 import subprocess
 import json
+import sqlite3
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+# Persistent ffprobe results, keyed by (path, mtime, size)
+DURATION_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'folder_analyzer', 'durations.sqlite'
+)
 
 
 class MediaDurationCalculator:
     """Calculates duration of media files using FFmpeg."""
     
-    def __init__(self):
+    # File categories (see FileClassifier) whose files have a duration
+    MEDIA_CATEGORIES = ('video', 'audio')
+    
+    # Seconds to wait for another process's cache write before giving up
+    CACHE_BUSY_TIMEOUT = 1
+    
+    def __init__(self, use_cache=True):
         self.ffprobe_cmd = self._find_ffprobe()
         
+        # Duration cache so unchanged files are not re-probed between runs.
+        # It is opened on the first lookup, so instances that never probe a
+        # file (e.g. --no-duration runs) create no files or descriptors.
+        self.use_cache = use_cache
+        self._cache_lock = threading.Lock()
+        self._cache_db = None
+        self._cache_unavailable = False
+        
+    def _open_cache(self):
+        """
+        Open (or create) the on-disk duration cache.
+        
+        Returns:
+            sqlite3.Connection: Cache connection, or None if it cannot be opened
+        """
+        try:
+            os.makedirs(os.path.dirname(DURATION_CACHE_PATH), exist_ok=True)
+            # Shared by the probe threads in calculate_total_duration; all
+            # access goes through self._cache_lock. Several processes (the
+            # optimized analyzer's pool workers) write to the same file, so
+            # each insert commits on its own (autocommit) and WAL keeps
+            # readers from blocking on a writer.
+            conn = sqlite3.connect(
+                DURATION_CACHE_PATH, timeout=self.CACHE_BUSY_TIMEOUT,
+                isolation_level=None, check_same_thread=False
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS durations ('
+                'path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, duration REAL)'
+            )
+            return conn
+        except (OSError, sqlite3.Error):
+            return None
+    
+    def _cache_connection(self):
+        """
+        Return the cache connection, opening it on first use.
+        
+        Must be called with self._cache_lock held. A cache that fails to open
+        is not retried for every file.
+        """
+        if self._cache_db is None and self.use_cache and not self._cache_unavailable:
+            self._cache_db = self._open_cache()
+            self._cache_unavailable = self._cache_db is None
+        return self._cache_db
+    
+    def close(self):
+        """Close the duration cache connection, if one was opened."""
+        with self._cache_lock:
+            if self._cache_db is not None:
+                try:
+                    self._cache_db.close()
+                except sqlite3.Error:
+                    pass
+                self._cache_db = None
+    
+    def _get_cached_duration(self, path, file_stat):
+        """Return the cached duration for an unchanged file, or None."""
+        if not self.use_cache:
+            return None
+        try:
+            with self._cache_lock:
+                cache_db = self._cache_connection()
+                if cache_db is None:
+                    return None
+                row = cache_db.execute(
+                    'SELECT mtime, size, duration FROM durations WHERE path = ?', (path,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row and row[0] == file_stat.st_mtime_ns and row[1] == file_stat.st_size:
+            return row[2]
+        return None
+    
+    def _store_duration(self, path, file_stat, duration):
+        """Record a probed duration in the cache."""
+        if not self.use_cache:
+            return
+        try:
+            with self._cache_lock:
+                cache_db = self._cache_connection()
+                if cache_db is None:
+                    return
+                cache_db.execute(
+                    'INSERT OR REPLACE INTO durations (path, mtime, size, duration) '
+                    'VALUES (?, ?, ?, ?)',
+                    (path, file_stat.st_mtime_ns, file_stat.st_size, duration)
+                )
+        except sqlite3.Error:
+            pass
+        
     def _find_ffprobe(self):
         """
         Find the ffprobe executable.
@@ -21,10 +133,15 @@ class MediaDurationCalculator:
         Returns:
             str: Path to ffprobe executable or None if not found
         """
-        # Common locations for ffprobe
+        # Look on PATH first; this is a directory lookup, no subprocess is run.
+        # Whether the binary actually works is checked by check_ffmpeg_availability.
+        for name in ('ffprobe', 'ffprobe.exe'):
+            path = shutil.which(name)
+            if path:
+                return path
+        
+        # Common install locations that may not be on PATH
         possible_paths = [
-            'ffprobe',
-            'ffprobe.exe',
             r'C:\ffmpeg\bin\ffprobe.exe',
             r'C:\Program Files\ffmpeg\bin\ffprobe.exe',
             '/usr/bin/ffprobe',
@@ -32,15 +149,8 @@ class MediaDurationCalculator:
         ]
         
         for path in possible_paths:
-            try:
-                result = subprocess.run([path, '-version'], 
-                                      capture_output=True, 
-                                      text=True, 
-                                      timeout=5)
-                if result.returncode == 0:
-                    return path
-            except (subprocess.SubprocessError, FileNotFoundError):
-                continue
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                return path
                 
         return None
     
@@ -48,6 +158,9 @@ class MediaDurationCalculator:
         """
         Get the duration of a media file in seconds.
         
+        Results are served from the duration cache when the file's mtime and
+        size are unchanged since it was last probed.
+        
         Args:
             file_path (str): Path to the media file
             
@@ -55,86 +168,108 @@ class MediaDurationCalculator:
             float: Duration in seconds, or 0 if unable to determine
         """
         if not self.ffprobe_cmd:
-            print("Warning: FFprobe not found. Media durations will be 0.")
+            logger.warning("Warning: FFprobe not found. Media durations will be 0.")
+            return 0
+            
+        # One stat serves both as the existence check and the cache key
+        try:
+            file_stat = os.stat(file_path)
+        except (OSError, ValueError):
             return 0
             
-        if not os.path.isfile(file_path):
+        if not stat.S_ISREG(file_stat.st_mode):
             return 0
             
+        cache_path = os.path.abspath(file_path)
+        duration = self._get_cached_duration(cache_path, file_stat)
+        if duration is not None:
+            return duration
+            
+        duration = self._probe_duration(file_path)
+        if duration > 0:
+            self._store_duration(cache_path, file_stat, duration)
+        return duration
+    
+    def _probe_duration(self, file_path):
+        """
+        Run ffprobe to read a media file's duration.
+        
+        Args:
+            file_path (str): Path to the media file
+            
+        Returns:
+            float: Duration in seconds, or 0 if unable to determine
+        """
         try:
+            # Ask only for the container duration as a bare number
             cmd = [
                 self.ffprobe_cmd,
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_format',
+                '-v', 'error',
+                '-show_entries', 'format=duration',
+                '-of', 'default=nw=1:nk=1',
                 file_path
             ]
             
-            # Use bytes mode to avoid encoding issues, then decode manually
+            # Bytes mode avoids decoding errors; float() accepts ASCII bytes
             result = subprocess.run(cmd, 
                                   capture_output=True, 
-                                  text=False,  # Use bytes mode
+                                  text=False,
                                   timeout=30)
             
             if result.returncode != 0:
                 return 0
-            
-            # Manually decode with error handling
-            try:
-                stdout_text = result.stdout.decode('utf-8', errors='ignore')
-            except UnicodeDecodeError:
-                try:
-                    stdout_text = result.stdout.decode('cp1252', errors='ignore')
-                except UnicodeDecodeError:
-                    stdout_text = result.stdout.decode('latin1', errors='ignore')
-            
-            # Check if stdout is None or empty
-            if not stdout_text or stdout_text.strip() == "":
-                return 0
                 
-            data = json.loads(stdout_text)
-            
-            if 'format' in data and 'duration' in data['format']:
-                return float(data['format']['duration'])
+            # ffprobe prints "N/A" when the duration is unknown
+            return float(result.stdout.strip())
                 
-        except (subprocess.SubprocessError, json.JSONDecodeError, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        except (subprocess.SubprocessError, OSError, ValueError):
             pass
             
         return 0
     
-    def calculate_total_duration(self, file_paths):
+    def _duration_or_zero(self, file_path):
+        """
+        Get a file's duration for calculate_total_duration, returning 0 for
+        invalid or missing paths and on any unexpected error.
+        """
+        try:
+            # Skip if file_path is None or invalid
+            if not file_path or not isinstance(file_path, (str, os.PathLike)):
+                return 0
+            
+            # Existence is checked by the single os.stat in get_duration
+            return self.get_duration(file_path)
+            
+        except Exception as e:
+            # Log the error but continue processing other files
+            logger.warning("Warning: Error processing file %s: %s", file_path, e)
+            return 0
+    
+    def calculate_total_duration(self, file_paths, max_workers=None):
         """
         Calculate total duration for a list of media files.
         
+        Each duration comes from a separate ffprobe process, so files are
+        probed concurrently from a thread pool; the threads only wait on the
+        subprocesses and do not contend for the GIL.
+        
         Args:
             file_paths (list): List of file paths
+            max_workers (int): Number of concurrent ffprobe processes
+                (defaults to 4 per CPU core)
             
         Returns:
             dict: Dictionary with individual durations and total
         """
         durations = {}
         total_duration = 0
+        max_workers = max_workers or (os.cpu_count() or 1) * 4
         
-        for file_path in file_paths:
-            try:
-                # Skip if file_path is None or invalid
-                if not file_path or not isinstance(file_path, (str, os.PathLike)):
-                    durations[file_path] = 0
-                    continue
-                
-                # Check if file exists and is accessible
-                if not os.path.exists(file_path) or not os.path.isfile(file_path):
-                    durations[file_path] = 0
-                    continue
-                
-                duration = self.get_duration(file_path)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(self._duration_or_zero, file_paths)
+            for file_path, duration in zip(file_paths, results):
                 durations[file_path] = duration
                 total_duration += duration
-                
-            except Exception as e:
-                # Log the error but continue processing other files
-                print(f"Warning: Error processing file {file_path}: {e}")
-                durations[file_path] = 0
             
         return {
             'individual_durations': durations,
@@ -300,7 +435,8 @@ class MediaDurationCalculator:
             else:
                 status['error'] = f"FFprobe returned error code {result.returncode}"
                 
-        except (subprocess.SubprocessError, UnicodeDecodeError) as e:
+        except (subprocess.SubprocessError, OSError, UnicodeDecodeError) as e:
+            # OSError: the binary exists but cannot be run (permissions, wrong arch)
             status['error'] = f"Error running FFprobe: {e}"
             
         return status
\ No newline at end of file
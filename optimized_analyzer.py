@@ -6,42 +6,63 @@ Uses concurrent processing, streaming, and caching for better efficiency.
 import os
 import sys
 import argparse
-import asyncio
-import aiofiles
+import gzip
 import hashlib
 import pickle
+import queue
+import threading
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from threading import Lock
+from concurrent.futures import ProcessPoolExecutor
 import multiprocessing
 import time
+from collections import defaultdict
 
-from file_classifier import FileClassifier
+from file_classifier import FileClassifier, _suffix_lower
 from media_utils import MediaDurationCalculator
+from scan_utils import SharedDirectoryQueue, read_directory, walk_files
+
+
+# Per-process calculator for duration workers, created once by the pool
+# initializer instead of once per batch
+_worker_calculator = None
+
+
+def _init_duration_worker(use_cache=True):
+    """Process pool initializer: build this worker's MediaDurationCalculator."""
+    global _worker_calculator
+    _worker_calculator = MediaDurationCalculator(use_cache=use_cache)
 
 
 class OptimizedFolderAnalyzer:
     """High-performance folder analyzer with concurrent processing."""
     
-    def __init__(self, max_workers=None, use_cache=True, batch_size=1000):
+    # Written as the first byte of each cache file; bump it when the cached
+    # layout changes so older files are ignored instead of misread
+    CACHE_VERSION = 1
+    
+    def __init__(self, max_workers=None, use_cache=True, batch_size=1000, scan_workers=None):
         self.classifier = FileClassifier()
-        self.media_calculator = MediaDurationCalculator()
+        self.media_calculator = MediaDurationCalculator(use_cache=use_cache)
         
         # Performance settings
         self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
         self.use_cache = use_cache
         self.batch_size = batch_size
+        # Threads reading directories concurrently; 1 walks sequentially
+        self.scan_workers = scan_workers or min(8, self.max_workers)
         
         # Cache settings
         self.cache_dir = Path(".folder_analyzer_cache")
         if use_cache:
             self.cache_dir.mkdir(exist_ok=True)
         
-        # Thread safety
-        self._lock = Lock()
+        # Progress reporting (set once; the hot loops read it into a local)
         self._progress_callback = None
         
+        # Set by scan_folder_streaming when it stops with files left unread
+        self.scan_truncated = False
+        
     def set_progress_callback(self, callback):
         """Set callback function for progress updates."""
         self._progress_callback = callback
@@ -51,10 +72,11 @@ class OptimizedFolderAnalyzer:
         if self._progress_callback:
             self._progress_callback(message, progress)
     
-    def _get_cache_key(self, folder_path):
-        """Generate cache key for folder."""
-        folder_str = str(Path(folder_path).resolve())
-        return hashlib.md5(folder_str.encode()).hexdigest()
+    def _get_cache_key(self, folder_str):
+        """Generate cache key for an already-resolved folder path string."""
+        # blake2b is built into hashlib (no OpenSSL dispatch) and, unlike md5,
+        # is not disabled on FIPS-mode hosts
+        return hashlib.blake2b(folder_str.encode(), digest_size=16).hexdigest()
     
     def _load_cache(self, cache_key):
         """Load cached results if available and valid."""
@@ -66,7 +88,9 @@ class OptimizedFolderAnalyzer:
             return None
             
         try:
-            with open(cache_file, 'rb') as f:
+            with gzip.open(cache_file, 'rb') as f:
+                if f.read(1) != bytes([self.CACHE_VERSION]):
+                    return None
                 cached_data = pickle.load(f)
                 
             # Check if cache is still valid (within 1 hour)
@@ -87,143 +111,217 @@ class OptimizedFolderAnalyzer:
         cache_file = self.cache_dir / f"{cache_key}.pkl"
         try:
             data['timestamp'] = time.time()
-            with open(cache_file, 'wb') as f:
-                pickle.dump(data, f)
+            # Path-heavy pickles compress well; level 1 keeps saving cheap
+            with gzip.open(cache_file, 'wb', compresslevel=1) as f:
+                f.write(bytes([self.CACHE_VERSION]))
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
         except Exception:
             pass
     
+    def _parallel_scandir_walk(self, root):
+        """
+        Walk a folder with scan_workers threads reading directories at once.
+        
+        Directory reads block in the kernel with the GIL released, so on
+        cold caches and network file systems sibling directories are read
+        concurrently. Workers share one SharedDirectoryQueue (as does
+        DFSFolderAnalyzer.parallel_dfs_scan) and hand each directory's files
+        to this generator through a queue, so files arrive in no fixed order.
+        An unexpected error in a worker is re-raised here once the other
+        workers have finished.
+        
+        Yields:
+            tuple: (path, size in bytes, lower-cased extension)
+        """
+        work = SharedDirectoryQueue([root])
+        results = queue.SimpleQueue()
+        lock = threading.Lock()
+        state = {'workers': self.scan_workers}
+        
+        def process(current_dir):
+            try:
+                subdirs, files = read_directory(current_dir)
+            except OSError:
+                return ()
+            if files:
+                results.put(files)
+            return subdirs
+        
+        def worker():
+            try:
+                work.run(process)
+            finally:
+                with lock:
+                    state['workers'] -= 1
+                    if not state['workers']:
+                        # Last worker out tells the consumer the walk is complete
+                        results.put(None)
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.scan_workers)]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while True:
+                files = results.get()
+                if files is None:
+                    break
+                yield from files
+        finally:
+            # Also reached when the consumer stops early (max_files)
+            work.stop()
+        
+        if work.error is not None:
+            raise work.error
+    
     def scan_folder_streaming(self, folder_path, max_files=1000000):
         """
-        Stream file paths instead of loading all into memory.
+        Stream files instead of loading all into memory.
         Generator function for memory efficiency.
+        
+        Yields (path, size, extension) tuples; sizes and extensions are
+        captured during the scan. If the scan stops at max_files with more
+        files left, self.scan_truncated is set.
         """
+        self.scan_truncated = False
         count = 0
+        progress_callback = self._progress_callback
         try:
-            folder_path = Path(folder_path).resolve()
+            # Lexical only; analyze_folder_optimized passes an already
+            # resolved path, so there is no second resolve() here
+            folder_path = os.path.abspath(os.fspath(folder_path))
             
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
+            if self.scan_workers > 1:
+                walk = self._parallel_scandir_walk(folder_path)
+            else:
+                walk = walk_files(folder_path)
+            
+            try:
+                for item in walk:
                     if count >= max_files:
+                        # Only reached once another file has been found, so a
+                        # folder with exactly max_files files is not truncated
+                        self.scan_truncated = True
                         self._update_progress(f"Reached maximum file limit ({max_files})")
                         return
                         
-                    file_path = Path(root) / file
-                    yield str(file_path)
+                    yield item
                     count += 1
                     
-                    if count % 10000 == 0:
-                        self._update_progress(f"Scanning... found {count} files")
+                    # Every 16384 files; a mask test is cheaper than a modulo
+                    if progress_callback is not None and (count & 0x3FFF) == 0:
+                        progress_callback(f"Scanning... found {count} files", None)
+            finally:
+                # Stops the scan threads promptly when we return early
+                walk.close()
                         
         except PermissionError as e:
             print(f"Permission error: {e}")
         except Exception as e:
             print(f"Error scanning folder: {e}")
     
-    def classify_files_batch(self, file_paths_batch):
-        """Classify a batch of files efficiently."""
-        classified = {}
+    def classify_files_batch(self, file_paths_batch, progress_start=20, progress_range=20):
+        """
+        Classify a batch of file paths efficiently in a single pass.
         
-        for file_path in file_paths_batch:
+        Paths that are not regular files are skipped. analyze_folder_optimized
+        does not use this: it classifies by the extension captured during the
+        scan instead.
+        """
+        classified = defaultdict(list)
+        category_for_extension = self.classifier.get_category_for_extension
+        total_files = len(file_paths_batch)
+        progress_callback = self._progress_callback
+        
+        for count, file_path in enumerate(file_paths_batch, 1):
             if not os.path.isfile(file_path):
                 continue
-                
-            category = self.classifier.get_category(file_path)
-            if category not in classified:
-                classified[category] = []
-            classified[category].append(file_path)
+            classified[category_for_extension(_suffix_lower(file_path))].append(file_path)
             
-        return classified
+            if progress_callback is not None and (count & 0x3FFF) == 0:
+                progress = progress_start + int((count / total_files) * progress_range)
+                progress_callback(f"Classifying... {count}/{total_files}", progress)
+            
+        return dict(classified)
     
     def calculate_sizes_concurrent(self, file_paths, progress_start=50, progress_range=20):
-        """Calculate file sizes using concurrent processing."""
+        """
+        Calculate the total size of a list of files.
+        
+        Runs as a plain loop: stat calls are bound by the disk rather than the
+        CPU, so a thread pool only added a Future and a dict entry per file.
+        The name is kept for existing callers.
+        """
         total_size = 0
-        processed_count = 0
         total_files = len(file_paths)
+        progress_callback = self._progress_callback
         
-        def get_file_size(file_path):
+        for processed_count, file_path in enumerate(file_paths, 1):
             try:
-                if os.path.exists(file_path):
-                    return os.path.getsize(file_path)
-                return 0
-            except (OSError, Exception):
-                return 0
-        
-        # Process in batches with concurrent execution
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit files in chunks
-            for i in range(0, total_files, self.batch_size):
-                batch = file_paths[i:i + self.batch_size]
-                
-                # Submit batch to executor
-                future_to_path = {executor.submit(get_file_size, path): path for path in batch}
-                
-                # Collect results
-                for future in as_completed(future_to_path):
-                    size = future.result()
-                    total_size += size
-                    processed_count += 1
-                    
-                    # Update progress
-                    if processed_count % 1000 == 0:
-                        progress = progress_start + int((processed_count / total_files) * progress_range)
-                        self._update_progress(f"Calculating sizes... {processed_count}/{total_files}", progress)
+                total_size += os.stat(file_path).st_size
+            except (OSError, ValueError):
+                pass
+            
+            # Update progress every 1024 files
+            if progress_callback is not None and (processed_count & 0x3FF) == 0:
+                progress = progress_start + int((processed_count / total_files) * progress_range)
+                progress_callback(f"Calculating sizes... {processed_count}/{total_files}", progress)
         
         return total_size
     
     def calculate_media_durations_parallel(self, media_files_by_type, progress_start=70, progress_range=25):
-        """Calculate media durations using parallel processing."""
+        """
+        Calculate media durations using parallel processing.
+        
+        One process pool is shared by all media types, so worker processes
+        are started once rather than once per type.
+        """
         media_durations = {}
         
-        def calculate_duration_batch(file_paths):
-            """Calculate durations for a batch of files."""
-            results = {}
-            for file_path in file_paths:
-                duration = self.media_calculator.get_duration(file_path)
-                results[file_path] = duration
-            return results
+        media_files_by_type = {media_type: files for media_type, files in media_files_by_type.items() if files}
+        if not media_files_by_type:
+            return media_durations
         
-        for media_type, files in media_files_by_type.items():
-            if not files:
-                continue
+        num_processes = min(self.max_workers, max(len(files) for files in media_files_by_type.values()))
+        
+        with ProcessPoolExecutor(
+            max_workers=num_processes,
+            initializer=_init_duration_worker,
+            initargs=(self.use_cache,)
+        ) as executor:
+            for media_type, files in media_files_by_type.items():
+                self._update_progress(f"Calculating {media_type} durations...", progress_start)
                 
-            self._update_progress(f"Calculating {media_type} durations...", progress_start)
-            
-            all_durations = {}
-            total_duration = 0
-            
-            # Process files in parallel batches
-            num_processes = min(self.max_workers, len(files))
-            batch_size = max(1, len(files) // num_processes)
-            
-            with ProcessPoolExecutor(max_workers=num_processes) as executor:
-                # Create batches
-                batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+                all_durations = {}
+                total_duration = 0
                 
-                # Submit batches
-                future_to_batch = {executor.submit(self._calculate_duration_batch_worker, batch): batch for batch in batches}
+                # Process files in parallel batches
+                batch_size = max(1, len(files) // min(num_processes, len(files)))
                 
-                # Collect results
-                for future in as_completed(future_to_batch):
-                    batch_results = future.result()
+                # map() submits every batch up front and yields results in
+                # order, so no future -> batch bookkeeping is needed
+                batches = (files[i:i + batch_size] for i in range(0, len(files), batch_size))
+                
+                for batch_results in executor.map(self._calculate_duration_batch_worker, batches):
                     all_durations.update(batch_results)
-                    
-                    # Update total
-                    for duration in batch_results.values():
-                        total_duration += duration
-            
-            media_durations[media_type] = {
-                'individual_durations': all_durations,
-                'total_duration': total_duration,
-                'total_files': len(files),
-                'formatted_duration': self.media_calculator.format_duration(total_duration)
-            }
+                    total_duration += sum(batch_results.values())
+                
+                media_durations[media_type] = {
+                    'individual_durations': all_durations,
+                    'total_duration': total_duration,
+                    'total_files': len(files),
+                    'formatted_duration': self.media_calculator.format_duration(total_duration)
+                }
         
         return media_durations
     
     @staticmethod
     def _calculate_duration_batch_worker(file_paths):
         """Worker function for parallel duration calculation."""
-        calculator = MediaDurationCalculator()
+        calculator = _worker_calculator
+        if calculator is None:
+            # Called outside a pool set up with _init_duration_worker
+            calculator = MediaDurationCalculator()
         results = {}
         
         for file_path in file_paths:
@@ -232,7 +330,7 @@ class OptimizedFolderAnalyzer:
                 results[file_path] = duration
             except Exception:
                 results[file_path] = 0
-                
+        
         return results
     
     def analyze_folder_optimized(self, folder_path, calculate_durations=True, max_files=1000000):
@@ -243,6 +341,9 @@ class OptimizedFolderAnalyzer:
         
         self._update_progress("Starting optimized analysis...", 0)
         
+        # Resolve once; the same string keys the cache and is reported back
+        folder_path = str(Path(folder_path).resolve())
+        
         # Check cache first
         cache_key = self._get_cache_key(folder_path)
         cached_data = self._load_cache(cache_key)
@@ -253,40 +354,35 @@ class OptimizedFolderAnalyzer:
         
         self._update_progress("Scanning folder (streaming mode)...", 5)
         
-        # Stream files instead of loading all into memory
-        file_paths = list(self.scan_folder_streaming(folder_path, max_files))
-        
-        if not file_paths:
+        # Scan, size and classify in a single streaming pass; no intermediate
+        # path list is built
+        classified_files = defaultdict(list)
+        extensions = defaultdict(set)
+        category_for_extension = self.classifier.get_category_for_extension
+        total_files = 0
+        total_size = 0
+        for file_path, size, ext in self.scan_folder_streaming(folder_path, max_files):
+            category = category_for_extension(ext)
+            classified_files[category].append(file_path)
+            if ext:
+                extensions[category].add(ext)
+            total_size += size
+            total_files += 1
+        
+        if not total_files:
             return self._create_empty_results(folder_path, "No files found")
         
-        if len(file_paths) >= max_files:
-            return self._create_empty_results(folder_path, f"Too many files (>{max_files})")
-        
-        self._update_progress(f"Processing {len(file_paths)} files...", 10)
+        # The scan stops at max_files; report what was found rather than
+        # discarding it
+        truncated = self.scan_truncated
+        if truncated:
+            self._update_progress(f"Results cover the first {max_files} files only", 40)
         
-        # Classify files in batches
-        self._update_progress("Classifying files...", 20)
-        classified_files = {}
-        
-        for i in range(0, len(file_paths), self.batch_size):
-            batch = file_paths[i:i + self.batch_size]
-            batch_classified = self.classify_files_batch(batch)
-            
-            # Merge results
-            for category, files in batch_classified.items():
-                if category not in classified_files:
-                    classified_files[category] = []
-                classified_files[category].extend(files)
-            
-            progress = 20 + int((i / len(file_paths)) * 20)
-            self._update_progress(f"Classifying... {i}/{len(file_paths)}", progress)
+        self._update_progress(f"Processing {total_files} files...", 40)
         
         # Generate summary
-        summary = self.classifier.get_category_summary(classified_files)
-        
-        # Calculate sizes concurrently
-        self._update_progress("Calculating file sizes (concurrent)...", 40)
-        total_size = self.calculate_sizes_concurrent(file_paths, 40, 20)
+        classified_files = dict(classified_files)
+        summary = self.classifier.get_category_summary(classified_files, extensions)
         
         # Calculate media durations if requested
         media_durations = {}
@@ -313,9 +409,9 @@ class OptimizedFolderAnalyzer:
         self._update_progress("Finalizing results...", 95)
         
         results = {
-            'folder_path': str(Path(folder_path).resolve()),
+            'folder_path': folder_path,
             'scan_time': datetime.now().isoformat(),
-            'total_files': len(file_paths),
+            'total_files': total_files,
             'classified_files': classified_files,
             'file_summary': summary,
             'media_durations': media_durations,
@@ -323,6 +419,7 @@ class OptimizedFolderAnalyzer:
             'ffmpeg_available': calculate_durations and media_durations,
             'formatted_size': self.format_size(total_size),
             'processing_time': time.time() - start_time,
+            'truncated': truncated,
             'optimization_used': True
         }
         
@@ -349,14 +446,15 @@ class OptimizedFolderAnalyzer:
         if size_bytes == 0:
             return "0 B"
             
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        i = 0
+        size_names = ("B", "KB", "MB", "GB", "TB")
         
-        while size_bytes >= 1024 and i < len(size_names) - 1:
-            size_bytes /= 1024.0
-            i += 1
+        # Unit index straight from the bit length (each unit is 2**10 larger);
+        # anything under 1 KB, fractions and negatives included, stays in bytes
+        i = 0
+        if size_bytes >= 1024:
+            i = min((int(size_bytes).bit_length() - 1) // 10, len(size_names) - 1)
             
-        return f"{size_bytes:.1f} {size_names[i]}"
+        return f"{size_bytes / (1 << (10 * i)):.1f} {size_names[i]}"
     
     def get_performance_stats(self):
         """Get performance statistics and recommendations."""
@@ -367,9 +465,9 @@ class OptimizedFolderAnalyzer:
             'cache_enabled': self.use_cache,
             'recommended_max_files': min(1000000, self.max_workers * 50000),
             'algorithms': {
-                'file_scanning': 'os.walk() streaming generator',
+                'file_scanning': 'os.scandir() streaming generator with parallel directory reads',
                 'classification': 'Batch processing with dictionary lookup',
-                'size_calculation': 'Concurrent ThreadPoolExecutor',
+                'size_calculation': 'Collected from DirEntry during the scan',
                 'media_durations': 'Parallel ProcessPoolExecutor',
                 'caching': 'Pickle-based with timestamp validation'
             }
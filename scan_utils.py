@@ -0,0 +1,120 @@
+"""
+Directory walking helpers shared by the folder analyzers.
+"""
+
+import os
+import threading
+from collections import deque
+
+from file_classifier import _suffix_lower
+
+
+def read_directory(dir_path):
+    """
+    Read one directory with os.scandir.
+
+    File type and size come from the DirEntry, so no separate stat pass is
+    needed afterwards. Like os.walk, symlinked directories are not descended
+    into.
+
+    Args:
+        dir_path (str): Directory to read
+
+    Returns:
+        tuple: (subdirectory paths, list of (path, size, extension)).
+        Raises OSError if the directory cannot be read.
+    """
+    subdirs = []
+    files = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif entry.is_file():
+                    files.append((entry.path, entry.stat().st_size, _suffix_lower(entry.name)))
+            except OSError:
+                continue
+    return subdirs, files
+
+
+def walk_files(root):
+    """
+    Walk a folder with an explicit os.scandir stack.
+
+    Unreadable directories are skipped, as os.walk does.
+
+    Args:
+        root (str): Folder to walk
+
+    Yields:
+        tuple: (path, size in bytes, lower-cased extension)
+    """
+    stack = [root]
+    while stack:
+        try:
+            subdirs, files = read_directory(stack.pop())
+        except OSError:
+            continue
+        stack.extend(subdirs)
+        yield from files
+
+
+class SharedDirectoryQueue:
+    """
+    Pending directories shared by several scanning threads.
+
+    Each thread calls run(process). process(item) reads one directory and
+    returns the new items (subdirectories) to queue. Threads wait while the
+    queue is empty but another thread may still add to it, so one huge
+    subtree is spread across every thread. The walk ends when the queue is
+    empty and no thread is busy, or once stop() is called.
+
+    If process raises, the queue is stopped so the other threads finish
+    instead of waiting forever, and the first exception is kept in
+    self.error for the caller to re-raise.
+    """
+
+    def __init__(self, items):
+        self._pending = deque(items)
+        self._condition = threading.Condition()
+        self._active = 0
+        self._stopped = False
+        self.error = None
+
+    def stop(self):
+        """Stop handing out directories; busy threads finish their current one."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def run(self, process):
+        """Worker loop: process queued items until the walk ends or is stopped."""
+        condition = self._condition
+        while True:
+            with condition:
+                while not self._pending and self._active and not self._stopped:
+                    condition.wait()
+                if not self._pending or self._stopped:
+                    condition.notify_all()
+                    return
+                item = self._pending.pop()
+                self._active += 1
+
+            new_items = ()
+            try:
+                new_items = process(item)
+            except BaseException as e:
+                with condition:
+                    if self.error is None:
+                        self.error = e
+                    self._stopped = True
+                return
+            finally:
+                # Always release the slot, or the other threads wait forever
+                with condition:
+                    if new_items:
+                        self._pending.extend(new_items)
+                    self._active -= 1
+                    condition.notify_all()
@@ -7,6 +7,7 @@ import os
 import json
 import threading
 import traceback
+from collections import defaultdict
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
 from datetime import datetime
@@ -70,27 +71,36 @@ def run_analysis_thread(folder_path, calculate_durations=True):
         # Custom analyzer with progress reporting
         progress_tracker.update('running', 'Scanning folder structure...', 10)
         
-        # Scan folder for files
-        file_paths = analyzer.scan_folder(folder_path)
+        # Scan folder for files; each entry is (path, size, extension) as
+        # read from the directory listing
+        files = list(analyzer.iter_files(folder_path))
         
-        if not file_paths:
+        if not files:
             progress_tracker.update('error', 'No files found or unable to access folder')
             return
         
         # Safety check for very large folders
-        if len(file_paths) > 100000:
-            progress_tracker.update('error', f'Folder contains too many files ({len(file_paths)}). Maximum supported: 100,000 files.')
+        if len(files) > 100000:
+            progress_tracker.update('error', f'Folder contains too many files ({len(files)}). Maximum supported: 100,000 files.')
             return
         
-        progress_tracker.update('running', f'Found {len(file_paths)} files. Classifying...', 30)
+        progress_tracker.update('running', f'Found {len(files)} files. Classifying...', 30)
         
-        # Classify files by extension
+        # Classify files by the extension captured during the scan
         try:
-            print(f"DEBUG: Starting classification of {len(file_paths)} files")
-            classified_files = analyzer.classifier.classify_files(file_paths)
+            print(f"DEBUG: Starting classification of {len(files)} files")
+            classified_files = defaultdict(list)
+            extensions = defaultdict(set)
+            category_for_extension = analyzer.classifier.get_category_for_extension
+            for file_path, _, ext in files:
+                category = category_for_extension(ext)
+                classified_files[category].append(file_path)
+                if ext:
+                    extensions[category].add(ext)
+            classified_files = dict(classified_files)
             print(f"DEBUG: Classification completed. Categories: {list(classified_files.keys())}")
             
-            summary = analyzer.classifier.get_category_summary(classified_files)
+            summary = analyzer.classifier.get_category_summary(classified_files, extensions)
             print(f"DEBUG: Summary generated successfully")
         except Exception as e:
             print(f"ERROR in classification: {e}")
@@ -99,37 +109,8 @@ def run_analysis_thread(folder_path, calculate_durations=True):
         
         progress_tracker.update('running', 'Calculating file sizes...', 50)
         
-        # Calculate total size with progress reporting
-        total_size = 0
-        total_files = len(file_paths)
-        print(f"DEBUG: Starting size calculation for {total_files} files")
-        
-        for i, file_path in enumerate(file_paths):
-            try:
-                if file_path is None:
-                    print(f"DEBUG: Warning - file_path at index {i} is None")
-                    continue
-                    
-                if not isinstance(file_path, (str, os.PathLike)):
-                    print(f"DEBUG: Warning - file_path at index {i} is not a string or path: {type(file_path)}")
-                    continue
-                
-                if os.path.exists(file_path):
-                    size = os.path.getsize(file_path)
-                    total_size += size
-                else:
-                    print(f"DEBUG: Warning - file does not exist: {file_path}")
-                
-                # Update progress every 1000 files
-                if i % 1000 == 0 and i > 0:
-                    progress = 50 + int((i / total_files) * 10)  # 50-60% range
-                    progress_tracker.update('running', f'Calculating sizes... {i}/{total_files}', progress)
-                    
-            except OSError as e:
-                print(f"DEBUG: OSError for file {file_path}: {e}")
-            except Exception as e:
-                print(f"DEBUG: Unexpected error for file {file_path}: {e}")
-                
+        # Sizes were read during the scan, so no file is stat'ed again here
+        total_size = sum(size for _, size, _ in files)
         print(f"DEBUG: Size calculation completed. Total size: {total_size}")
         
         # Calculate media durations if requested
@@ -165,6 +146,8 @@ def run_analysis_thread(folder_path, calculate_durations=True):
                     except Exception as e:
                         print(f"ERROR calculating audio durations: {e}")
                         progress_tracker.update('running', 'Warning: Audio duration calculation failed, continuing...', 85)
+                
+                analyzer.media_calculator.close()
         
         progress_tracker.update('running', 'Finalizing results...', 95)
         
@@ -172,7 +155,7 @@ def run_analysis_thread(folder_path, calculate_durations=True):
         results = {
             'folder_path': str(folder_path),
             'scan_time': datetime.now().isoformat(),
-            'total_files': len(file_paths),
+            'total_files': len(files),
             'classified_files': classified_files,
             'file_summary': summary,
             'media_durations': media_durations,